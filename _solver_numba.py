@@ -0,0 +1,278 @@
+"""
+MIT License
+
+Copyright (c) 2023 Nikita Belomestnykh
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+from numba import njit, prange
+
+import parser
+
+# Коды операций байткода, как в parser.py. Ядра с cache=True запоминают значения
+# глобальных переменных, а кэш numba сбрасывается только при изменении этого
+# файла, поэтому коды заданы здесь и сверяются с parser.py при импорте
+OP_NUM = 0
+OP_X = 1
+OP_Y = 2
+OP_ADD = 3
+OP_SUB = 4
+OP_MUL = 5
+OP_DIV = 6
+OP_POW = 7
+OP_NEG = 8
+
+if (OP_NUM, OP_X, OP_Y, OP_ADD, OP_SUB, OP_MUL, OP_DIV, OP_POW, OP_NEG) != (
+    parser.OP_NUM,
+    parser.OP_X,
+    parser.OP_Y,
+    parser.OP_ADD,
+    parser.OP_SUB,
+    parser.OP_MUL,
+    parser.OP_DIV,
+    parser.OP_POW,
+    parser.OP_NEG,
+):
+    # differential.py в этом случае решает на чистом python
+    raise ImportError("Коды операций ядер numba не совпадают с parser.py")
+
+# Флаги fastmath без nnan и ninf: решение проверяется на inf и nan в check_finite.
+# Без reassoc: иначе (a + inf) - inf сокращается до a
+FASTMATH = {"nsz", "arcp", "contract", "afn"}
+
+
+def code_arrays(code: list[tuple[int, float]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Разделяет байткод ноды на типизированные массивы для numba.
+
+    Байткод (см. Node.compile): code
+    """
+    ops = np.asarray([op for op, _ in code], np.int8)
+    vals = np.asarray([v for _, v in code], np.float64)
+    return ops, vals
+
+
+def check_finite(ys: np.ndarray):
+    """
+    Проверка решения, посчитанного ядрами ниже.
+
+    Ядра компилируются с error_model="numpy" и не бросают ZeroDivisionError
+    (иначе исключение нельзя поднять из параллельного цикла), поэтому деление
+    на ноль и недопустимые степени видны только как inf и nan в решении: ys
+    """
+    if not np.isfinite(ys).all():
+        raise FloatingPointError(
+            "Решение содержит бесконечные или неопределённые значения"
+        )
+
+
+@njit(cache=True, fastmath=FASTMATH, error_model="numpy")
+def eval_code(
+    code_ops: np.ndarray,
+    code_vals: np.ndarray,
+    x: float,
+    y: float,
+    stack: np.ndarray,
+) -> float:
+    """
+    Вычисление байткода уравнения в точке x, y.
+
+    Байткод: code_ops, code_vals
+    Буфер стека (не короче байткода): stack
+    """
+    sp = 0
+    for i in range(code_ops.shape[0]):
+        op = code_ops[i]
+        if op == OP_NUM:
+            stack[sp] = code_vals[i]
+            sp += 1
+        elif op == OP_X:
+            stack[sp] = x
+            sp += 1
+        elif op == OP_Y:
+            stack[sp] = y
+            sp += 1
+        elif op == OP_ADD:
+            sp -= 1
+            stack[sp - 1] = stack[sp - 1] + stack[sp]
+        elif op == OP_SUB:
+            sp -= 1
+            stack[sp - 1] = stack[sp - 1] - stack[sp]
+        elif op == OP_MUL:
+            sp -= 1
+            stack[sp - 1] = stack[sp - 1] * stack[sp]
+        elif op == OP_DIV:
+            sp -= 1
+            stack[sp - 1] = stack[sp - 1] / stack[sp]
+        elif op == OP_POW:
+            sp -= 1
+            stack[sp - 1] = stack[sp - 1] ** stack[sp]
+        else:
+            stack[sp - 1] = -stack[sp - 1]
+    return stack[sp - 1]
+
+
+@njit(cache=True, fastmath=FASTMATH, error_model="numpy")
+def runge_kutta(
+    code_ops: np.ndarray,
+    code_vals: np.ndarray,
+    x0: float,
+    y0: float,
+    h: float,
+    stack: np.ndarray,
+) -> float:
+    """
+    Нахождение решения в следующей точке методом Рунге-Кутты.
+
+    Шаг: h
+    Предыдущее решение: x0, y0
+    Байткод уравнения: code_ops, code_vals
+    """
+    k1 = eval_code(code_ops, code_vals, x0, y0, stack)
+    k2 = eval_code(code_ops, code_vals, x0 + h / 2, y0 + h / 2 * k1, stack)
+    k3 = eval_code(code_ops, code_vals, x0 + h / 2, y0 + h / 2 * k2, stack)
+    k4 = eval_code(code_ops, code_vals, x0 + h, y0 + h * k3, stack)
+    return y0 + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+@njit(cache=True, fastmath=FASTMATH, error_model="numpy")
+def get_rg_4(
+    code_ops: np.ndarray,
+    code_vals: np.ndarray,
+    x0: float,
+    y0: float,
+    h: float,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    stack: np.ndarray,
+):
+    """
+    Нахождение 4 точек решения методом Рунге-Кутты в xs[0:4], ys[0:4].
+    Используется для метода Адамса.
+
+    Шаг: h
+    Изначальное решение: x0, y0
+    Байткод уравнения: code_ops, code_vals
+    """
+    xs[0] = x0
+    ys[0] = y0
+    for i in range(1, 4):
+        ys[i] = runge_kutta(code_ops, code_vals, xs[i - 1], ys[i - 1], h, stack)
+        xs[i] = xs[i - 1] + h
+
+
+@njit(cache=True, fastmath=FASTMATH, error_model="numpy")
+def solve_adams(
+    code_ops: np.ndarray,
+    code_vals: np.ndarray,
+    x0: float,
+    y0: float,
+    h: float,
+    n: int,
+    xs: np.ndarray,
+    ys: np.ndarray,
+):
+    """
+    Решение ОДУ методом Адамса 4 ранга, заполняет xs, ys длины max(n, 3) + 1.
+
+    Шаг: h
+    Количество шагов: n
+    Изначальное решение: x0, y0
+    Байткод уравнения: code_ops, code_vals
+    """
+    stack = np.empty(code_ops.shape[0])
+    get_rg_4(code_ops, code_vals, x0, y0, h, xs, ys, stack)
+    # Кольцевой буфер значений уравнения: fs[k % 4] хранит f(xs[k], ys[k])
+    fs = np.empty(4)
+    for k in range(3):
+        fs[k] = eval_code(code_ops, code_vals, xs[k], ys[k], stack)
+    for i in range(4, n + 1):
+        f1 = eval_code(code_ops, code_vals, xs[i - 1], ys[i - 1], stack)
+        fs[(i - 1) % 4] = f1
+        xs[i] = xs[i - 1] + h
+        ys[i] = ys[i - 1] + h * (
+            55 / 24 * f1
+            - 59 / 24 * fs[(i - 2) % 4]
+            + 37 / 24 * fs[(i - 3) % 4]
+            - 9 / 24 * fs[i % 4]
+        )
+
+
+@njit(cache=True, fastmath=FASTMATH, error_model="numpy")
+def solve_euler_cauchy(
+    code_ops: np.ndarray,
+    code_vals: np.ndarray,
+    x0: float,
+    y0: float,
+    h: float,
+    n: int,
+    xs: np.ndarray,
+    ys: np.ndarray,
+):
+    """
+    Решение ОДУ методом Эйлера-Коши, заполняет xs, ys длины n + 1.
+
+    Шаг: h
+    Количество шагов: n
+    Изначальное решение: x0, y0
+    Байткод уравнения: code_ops, code_vals
+    """
+    stack = np.empty(code_ops.shape[0])
+    xs[0] = x0
+    ys[0] = y0
+    for i in range(1, n + 1):
+        y = eval_code(code_ops, code_vals, xs[i - 1], ys[i - 1], stack)
+        x = xs[i - 1] + h
+        yi = ys[i - 1] + h * y
+        xs[i] = x
+        ys[i] = ys[i - 1] + (h / 2) * (y + eval_code(code_ops, code_vals, x, yi, stack))
+
+
+@njit(parallel=True, cache=True, fastmath=FASTMATH, error_model="numpy")
+def solve_adams_sweep(
+    code_ops: np.ndarray,
+    code_vals: np.ndarray,
+    x0: float,
+    y0s: np.ndarray,
+    h: float,
+    n: int,
+    xs: np.ndarray,
+    ys: np.ndarray,
+):
+    """
+    Решение ОДУ методом Адамса 4 ранга для набора начальных значений,
+    значения y0s решаются параллельно на всех ядрах.
+    Заполняет xs длины m = max(n, 3) + 1 и ys размера (len(y0s), m).
+
+    Шаг: h
+    Количество шагов: n
+    Изначальное решение: x0 и массив значений y0s
+    Байткод уравнения: code_ops, code_vals
+    """
+    for k in prange(y0s.shape[0]):
+        # У каждого потока свой буфер x, общий xs заполняется ниже
+        lane_xs = np.empty(xs.shape[0])
+        solve_adams(code_ops, code_vals, x0, y0s[k], h, n, lane_xs, ys[k])
+    xs[0] = x0
+    for i in range(1, xs.shape[0]):
+        xs[i] = xs[i - 1] + h
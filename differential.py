@@ -24,64 +24,173 @@ SOFTWARE.
 
 from __future__ import annotations
 
+import argparse
 import re
+import sys
 from parser import *
-from typing import Any
+from typing import Any, Callable
 
+import numpy as np
 
-def runge_kutta(eq: Node, x0: float, y0: float, h: float) -> float:
+try:
+    from _solver_numba import (
+        check_finite,
+        code_arrays,
+        solve_adams,
+        solve_adams_sweep,
+        solve_euler_cauchy,
+    )
+except ImportError:
+    # Без numba решение считается на чистом python
+    code_arrays = None
+
+# Коэффициенты метода Адамса 4 ранга
+B0 = 55.0 / 24.0
+B1 = -59.0 / 24.0
+B2 = 37.0 / 24.0
+B3 = -9.0 / 24.0
+
+
+def runge_kutta(
+    eq: Node,
+    x0: float,
+    y0: float,
+    h: float,
+    vectorized: bool = False,
+    k1: float = None,
+) -> float:
     """
     Нахождение решения в следующей точке методом Рунге-Кутты.
 
     Шаг: h
-    Предыдущее решение: x0, y0
+    Предыдущее решение: x0, y0 (y0 - массив, если vectorized)
+    Уже известное значение уравнения в x0, y0: k1
     Уравнение: eq
     """
-    k1 = eq.compute(x0, y0)
-    k2 = eq.compute(x0 + h / 2, y0 + h / 2 * k1)
-    k3 = eq.compute(x0 + h / 2, y0 + h / 2 * k2)
-    k4 = eq.compute(x0 + h, y0 + h * k3)
+    f = eq.compute_vec if vectorized else eq.function()
+    h2 = h / 2
+    if k1 is None:
+        k1 = f(x0, y0)
+    k2 = f(x0 + h2, y0 + h2 * k1)
+    k3 = f(x0 + h2, y0 + h2 * k2)
+    k4 = f(x0 + h, y0 + h * k3)
     return y0 + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
 
 
-def get_rg_4(eq: Node, x0: float, y0: float, h: float) -> list[tuple[float, float]]:
+def get_rg_4(
+    eq: Node,
+    x0: float,
+    y0: float,
+    h: float,
+    xs: np.ndarray,
+    ys: np.ndarray,
+    vectorized: bool = False,
+):
     """
-    Нахождение 4 точек решения методом Рунге-Кутты.
+    Нахождение 4 точек решения методом Рунге-Кутты в xs[0:4], ys[0:4].
     Используется для метода Адамса.
 
     Шаг: h
-    Изначальное решение: x0, y0
+    Изначальное решение: x0, y0 (y0 - массив, если vectorized)
     Уравнение: eq
     """
-    values = [(x0, y0)]
-    for i in range(3):
-        x, y = values[i]
-        y = runge_kutta(eq, x, y, h)
+    xs[0] = x = x0
+    ys[0] = y = y0
+    for i in range(1, 4):
+        y = runge_kutta(eq, x, y, h, vectorized)
         x += h
-        values.append((x, y))
-    return values
+        xs[i] = x
+        ys[i] = y
+
+
+def lmultistep(
+    f: Callable[[float, float], float],
+    xs: np.ndarray,
+    ys: np.ndarray,
+    fs: list[float],
+    i: int,
+    h: float,
+    _B0: float = B0,
+    _B1: float = B1,
+    _B2: float = B2,
+    _B3: float = B3,
+):
+    """
+    Linear multistep method.
+    Нахождение решения в точке i методом Адамса.
 
+    Шаг: h
+    Массивы решения, заполненные до точки i: xs, ys
+    Кольцевой буфер значений уравнения в точках i-4..i-2 (fs[k % 4]): fs
+    Функция уравнения (eq.function()): f
 
-def lmultistep(eq: Node, v: list[tuple[float, float]], h: float) -> tuple[float, float]:
+    Коэффициенты _B0.._B3 связаны по умолчанию, чтобы читаться как локальные.
     """
-    Linear multistep method.
-    Нахождение решения в следующей точке методом Адамса.
+    x1 = xs.item(i - 1)
+    y1 = ys.item(i - 1)
+    fs[(i - 1) % 4] = f1 = f(x1, y1)
+    xs[i] = x1 + h
+    ys[i] = y1 + h * (
+        _B0 * f1 + _B1 * fs[(i - 2) % 4] + _B2 * fs[(i - 3) % 4] + _B3 * fs[i % 4]
+    )
+
+
+def solve_adams_batch(
+    eq: Node, x0: float, y0: np.ndarray, h: float, n: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Решение ОДУ методом Адамса 4 ранга сразу для набора начальных значений.
+    Каждый этап считается одной векторной операцией над всеми y0.
 
     Шаг: h
-    4 точки предварительного решения: v
+    Количество шагов: n
+    Изначальное решение: x0 и массив значений y0
     Уравнение: eq
+
+    Возвращает xs длины m и ys размера (m, len(y0)), где m = max(n, 3) + 1.
     """
-    return (
-        v[-1][0] + h,
-        v[-1][1]
-        + h
-        * (
-            55 / 24 * eq.compute(v[-1][0], v[-1][1])
-            - 59 / 24 * eq.compute(v[-2][0], v[-2][1])
-            + 37 / 24 * eq.compute(v[-3][0], v[-3][1])
-            - 9 / 24 * eq.compute(v[-4][0], v[-4][1])
-        ),
-    )
+    m = max(n, 3) + 1
+    xs = np.empty(m)
+    ys = np.empty((m, len(y0)))
+    fs = np.empty((4, len(y0)))
+    f = eq.compute_vec
+    item = xs.item
+    b0, b1, b2, b3 = B0, B1, B2, B3
+    with np.errstate(divide="raise", invalid="raise"):
+        get_rg_4(eq, x0, y0, h, xs, ys, True)
+        for k in range(3):
+            fs[k] = f(item(k), ys[k])
+        for i in range(4, n + 1):
+            x1 = item(i - 1)
+            fs[(i - 1) % 4] = f1 = f(x1, ys[i - 1])
+            xs[i] = x1 + h
+            ys[i] = ys[i - 1] + h * (
+                b0 * f1 + b1 * fs[(i - 2) % 4] + b2 * fs[(i - 3) % 4] + b3 * fs[i % 4]
+            )
+    return xs, ys
+
+
+def adams_ensemble(
+    eq: Node, x0: float, y0: np.ndarray, h: float, n: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Решение ОДУ методом Адамса 4 ранга для набора начальных значений:
+    параллельно numba-ядром, если оно доступно, иначе векторно на numpy.
+
+    Шаг: h
+    Количество шагов: n
+    Изначальное решение: x0 и массив значений y0
+    Уравнение: eq
+
+    Возвращает xs длины m и ys размера (m, len(y0)), где m = max(n, 3) + 1.
+    """
+    if code_arrays is None:
+        return solve_adams_batch(eq, x0, y0, h, n)
+    xs = np.empty(max(n, 3) + 1)
+    ys = np.empty((len(y0), len(xs)))
+    solve_adams_sweep(*code_arrays(eq.compile()), x0, y0, h, n, xs, ys)
+    check_finite(ys)
+    return xs, ys.T
 
 
 def euler_cauchy(eq: Node, x0: float, y0: float, h: float) -> tuple[float, float]:
@@ -92,32 +201,125 @@ def euler_cauchy(eq: Node, x0: float, y0: float, h: float) -> tuple[float, float
     Предыдущее решение: x0, y0
     Уравнение: eq
     """
-    y = eq.compute(x0, y0)
+    f = eq.function()
+    y = f(x0, y0)
     x = x0 + h
     yi = y0 + h * y
     return (
         x,
-        y0 + (h / 2) * (y + eq.compute(x, yi)),
+        y0 + (h / 2) * (y + f(x, yi)),
     )
 
 
-def print_table(v: list[tuple[float, float]], h: float):
+def solve_adaptive(
+    eq: Node,
+    x0: float,
+    y0: float,
+    x_end: float,
+    h: float,
+    rtol: float = 1e-6,
+    atol: float = 1e-8,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Решение ОДУ методом Рунге-Кутты с адаптивным шагом (удвоение шага).
+    Шаг h сравнивается с двумя шагами h/2, по их разнице оценивается
+    ошибка и подбирается следующий шаг.
+
+    Начальный шаг: h
+    Изначальное решение: x0, y0
+    Конец отрезка: x_end
+    Относительная и абсолютная точность: rtol, atol
+    Уравнение: eq
+
+    Возвращает принятые точки xs, ys и значения уравнения в них fs.
+    """
+    f = eq.function()
+    x, y = x0, y0
+    xs, ys, fs = [x], [y], [f(x, y)]
+    while x < x_end:
+        # Последний шаг попадает точно в x_end, остаток в пределах округления
+        # не оставляется на отдельный шаг
+        last = x_end - x - h <= 1e-12 * (abs(x_end) + 1)
+        if last:
+            h = x_end - x
+        if h <= 1e-12 * (abs(x) + 1):
+            raise EvaluateError("Шаг стал слишком мал, требуемая точность недостижима")
+        # Значение уравнения в x, y уже посчитано при принятии прошлого шага
+        k1 = fs[-1]
+        y_full = runge_kutta(eq, x, y, h, k1=k1)
+        y_mid = runge_kutta(eq, x, y, h / 2, k1=k1)
+        y_half = runge_kutta(eq, x + h / 2, y_mid, h / 2)
+        err = abs(y_half - y_full) / 15
+        tol = atol + rtol * abs(y_half)
+        if err > tol:
+            h /= 2
+            continue
+        # Экстраполяция Ричардсона повышает порядок принятого решения
+        y = y_half + (y_half - y_full) / 15
+        x = x_end if last else x + h
+        xs.append(x)
+        ys.append(y)
+        fs.append(f(x, y))
+        # Ошибка растёт как h^5, после увеличения в 1.5 раза она останется в пределах tol
+        if err < tol / 8:
+            h *= 1.5
+    return np.array(xs), np.array(ys), np.array(fs)
+
+
+def hermite(
+    xs: np.ndarray, ys: np.ndarray, fs: np.ndarray, x: np.ndarray
+) -> np.ndarray:
+    """
+    Кубическая интерполяция Эрмита решения по значениям и производным в узлах.
+
+    Узлы решения: xs, ys
+    Значения производной в узлах: fs
+    Точки интерполяции: x
+    """
+    if len(xs) == 1:
+        # Отрезок нулевой длины: решение есть только в начальной точке
+        return np.full(np.shape(x), ys[0])
+    j = np.clip(np.searchsorted(xs, x, side="right") - 1, 0, len(xs) - 2)
+    dx = xs[j + 1] - xs[j]
+    t = (x - xs[j]) / dx
+    return (
+        (1 + 2 * t) * (1 - t) ** 2 * ys[j]
+        + t * (1 - t) ** 2 * dx * fs[j]
+        + t**2 * (3 - 2 * t) * ys[j + 1]
+        + t**2 * (t - 1) * dx * fs[j + 1]
+    )
+
+
+def print_table(xs: np.ndarray, ys: np.ndarray, h: float):
     """
     Выводит таблицу x, y с форматом строк.
 
-    Пары значений [(x, y), ...]: v
+    Значения x (монотонные) и y: xs, ys
     Размер шага: h
     """
-    w1 = max(list(map(lambda x: len(str(round(x[0]))) + len(str(h)) + 1, v)))
-    w2 = max(list(map(lambda x: len(str(round(x[1]))) + 8, v)))
+    # Длина целой части максимальна на краях диапазона значений
+    w1 = max(len(str(round(x))) for x in (xs[0], xs[-1])) + len(str(h)) + 1
+    w2 = max(len(str(round(y))) for y in (ys.min(), ys.max())) + 8
     k = len(str(h)) - 2
     hl = "+" + "-" * (w1 + 2) + "+" + "-" * (w2 + 2) + "+\n"
     l = "| {:<" + str(w1) + "} | {:<" + str(w2) + "} |\n"
     fl = "| {:" + str(w1) + "." + str(k) + "f} | {:" + str(w2) + ".6f} |\n"
 
-    print(hl + l.format("x", "y") + hl, end="")
-    for x, y in v:
-        print(fl.format(x, y) + hl, end="")
+    rows = [fl.format(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+    sys.stdout.write(hl + l.format("x", "y") + hl + hl.join(rows) + hl)
+
+
+def print_ensemble(xs: np.ndarray, ys: np.ndarray, y0: np.ndarray, h: float):
+    """
+    Выводит таблицы x, y для каждого начального значения ансамбля.
+
+    Значения x и y размера (len(xs), len(y0)): xs, ys
+    Начальные значения: y0
+    Размер шага: h
+    """
+    for k, y in enumerate(y0):
+        print("y0 = {}".format(y))
+        print_table(xs, ys[:, k], h)
 
 
 def user_input(target: list[Any], msg: str) -> list[Any]:
@@ -148,10 +350,12 @@ def user_input(target: list[Any], msg: str) -> list[Any]:
             print("\n\tОшибка ввода, неверный тип данных ввода!\n")
 
 
-def main():
+def main(n_ensemble: int = 1):
     """
     Главная функция работы с программой.
     Обрабатывает ввод и передаёт его на решение 2 методам.
+
+    Количество начальных значений y0 для метода Адамса: n_ensemble
     """
     exit: bool = False
     done: bool = False
@@ -162,6 +366,7 @@ def main():
     h: float = 0
     x0: float = 0
     y0: float = 0
+    y0s: np.ndarray = None
 
     while not exit:
         done = False
@@ -198,13 +403,14 @@ def main():
         while not (done or exit):
             try:
                 n = user_input([int], "Введите количество точек внутри отрезка (n) :")
+                if n < 1:
+                    print("\n\tОшибка ввода, количество шагов должно быть больше 0!\n")
+                    continue
                 h = (b - a) / n
                 done = True
             except KeyboardInterrupt:
                 exit = True
                 done = True
-            except ZeroDivisionError:
-                print("\n\tОшибка ввода, количество шагов должно быть больше 0!\n")
             except Exception as e:
                 print("\n\t{}: {}\n".format(type(e).__name__, e.args[0]))
         done = False
@@ -226,27 +432,85 @@ def main():
                 )
             except Exception as e:
                 print("\n\t{}: {}\n".format(type(e).__name__, e.args[0]))
+        done = n_ensemble < 2
+
+        while not (done or exit):
+            try:
+                y1 = user_input(
+                    [float], "Введите последнее начальное значение ансамбля (y1) :"
+                )
+
+                eq.compute(x0, y1)
+                y0s = np.linspace(y0, y1, n_ensemble)
+                done = True
+            except KeyboardInterrupt:
+                exit = True
+                done = True
+            except ZeroDivisionError:
+                print(
+                    "\n\tОшибка ввода, данные начальные условия ОДУ не являются решением!\n"
+                )
+            except Exception as e:
+                print("\n\t{}: {}\n".format(type(e).__name__, e.args[0]))
         done = False
 
         while not (done or exit):
             try:
                 cmd = user_input(
                     [str],
-                    "Выберите метод решения:\n1) Метод Адамса\n2) Метод Эйлера-Коши\ne) Выйти из программы\n*) Решить другое уравнение",
+                    "Выберите метод решения:\n1) Метод Адамса\n2) Метод Эйлера-Коши\n3) Метод Рунге-Кутты с адаптивным шагом\n4) Метод Адамса для диапазона y0\ne) Выйти из программы\n*) Решить другое уравнение",
                 )
-                if cmd == "1":
+                if cmd == "1" and y0s is not None:
+                    print("Решение задания методом Адамса 4 ранга для ансамбля.")
+                    xs, ys = adams_ensemble(eq, x0, y0s, h, n)
+                    print_ensemble(xs, ys, y0s, h)
+                elif cmd == "1":
                     print("Решение задания методом Адамса 4 ранга.")
-                    values = get_rg_4(eq, x0, y0, h)
-                    for i in range(n - 3):
-                        values.append(lmultistep(eq, values, h))
-                    print_table(values, h)
+                    xs = np.empty(max(n, 3) + 1)
+                    ys = np.empty(max(n, 3) + 1)
+                    if code_arrays is not None:
+                        solve_adams(*code_arrays(eq.compile()), x0, y0, h, n, xs, ys)
+                        check_finite(ys)
+                    else:
+                        get_rg_4(eq, x0, y0, h, xs, ys)
+                        f = eq.function()
+                        fs = [f(xs.item(k), ys.item(k)) for k in range(3)]
+                        fs.append(0.0)
+                        step = lmultistep
+                        for i in range(4, n + 1):
+                            step(f, xs, ys, fs, i, h)
+                    print_table(xs, ys, h)
                 elif cmd == "2":
                     print("Решение задачи методом Эйлера-Коши.")
-                    values = [(x0, y0)]
-                    for i in range(n):
-                        item = values[i]
-                        values.append(euler_cauchy(eq, item[0], item[1], h))
-                    print_table(values, h)
+                    xs = np.empty(n + 1)
+                    ys = np.empty(n + 1)
+                    if code_arrays is not None:
+                        solve_euler_cauchy(
+                            *code_arrays(eq.compile()), x0, y0, h, n, xs, ys
+                        )
+                        check_finite(ys)
+                    else:
+                        xs[0], ys[0] = x0, y0
+                        step = euler_cauchy
+                        item_x = xs.item
+                        item_y = ys.item
+                        for i in range(n):
+                            xs[i + 1], ys[i + 1] = step(eq, item_x(i), item_y(i), h)
+                    print_table(xs, ys, h)
+                elif cmd == "3":
+                    print("Решение задачи методом Рунге-Кутты с адаптивным шагом.")
+                    xs = x0 + h * np.arange(n + 1)
+                    ys = hermite(*solve_adaptive(eq, x0, y0, xs[-1], h), xs)
+                    print_table(xs, ys, h)
+                elif cmd == "4":
+                    y1, y2, k = user_input(
+                        [float, float, int],
+                        "Введите диапазон начальных значений y0 и их количество (y1 y2 k) :",
+                    )
+                    print("Решение задания методом Адамса 4 ранга для диапазона y0.")
+                    y0_range = np.linspace(y1, y2, k)
+                    xs, ys = adams_ensemble(eq, x0, y0_range, h, n)
+                    print_ensemble(xs, ys, y0_range, h)
                 elif cmd == "e":
                     exit = True
                     done = True
@@ -255,7 +519,7 @@ def main():
             except KeyboardInterrupt:
                 exit = True
                 done = True
-            except ZeroDivisionError:
+            except (ZeroDivisionError, FloatingPointError):
                 print(
                     "\n\tОшибка ввода, данные начальные условия ОДУ не являются решением!\n"
                 )
@@ -264,4 +528,13 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    arg_parser = argparse.ArgumentParser(
+        description="Решение ОДУ методом Адамса и Эйлера-Коши"
+    )
+    arg_parser.add_argument(
+        "--n-ensemble",
+        type=int,
+        default=1,
+        help="количество начальных значений y0 для метода Адамса",
+    )
+    main(arg_parser.parse_args().n_ensemble)
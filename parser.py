@@ -24,17 +24,30 @@ SOFTWARE.
 
 from __future__ import annotations
 
+import functools
 import math
 import operator
 import re
-from enum import Enum, auto, unique
+import weakref
+from enum import Enum, IntEnum, auto, unique
+from typing import Callable
 
+import numpy as np
 from typing_extensions import Self
 
 
 @unique
-class TokenType(Enum):
-    """Фиксированное описание всех возможных типов нод парсера"""
+class TokenType(IntEnum):
+    """
+    Фиксированное описание всех возможных типов нод парсера.
+
+    Значения - целые числа, поэтому сравнения типов нод сравнивают int.
+    """
+
+    # Строковое представление как у Enum, а не число
+    __str__ = Enum.__str__
+    __format__ = Enum.__format__
+
     T_VR1 = auto()
     T_VR2 = auto()
     T_NUM = auto()
@@ -53,8 +66,33 @@ class TokenType(Enum):
     T_END = auto()
 
 
-# Список унарных операций
-UNARY = [TokenType.T_NEG]
+# Операции, цепочки которых сворачиваются в n-арные ноды
+CHAINS = frozenset([TokenType.T_ADD, TokenType.T_MUL])
+
+# Наибольший модуль целой степени листа, раскрываемой в умножения
+POW_UNROLL = 8
+
+# Типы нод, от которых зависит значение выражения
+VARIABLES = frozenset([TokenType.T_VR1, TokenType.T_VR2, TokenType.T_DIF])
+
+# Типы нод, к которым парсер присоединяет детей
+BRANCHES = frozenset(
+    [
+        TokenType.T_ADD,
+        TokenType.T_NEG,
+        TokenType.T_MUL,
+        TokenType.T_DIV,
+        TokenType.T_POW,
+        TokenType.T_DIF,
+        TokenType.T_EQU,
+    ]
+)
+
+# Общий пустой список детей листьев
+_EMPTY = ()
+
+# Интернированные ноды результата разбора
+_INTERN: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
 
 # Маппинг токенов на типы нод
 TOKEN_MAP = {
@@ -74,6 +112,9 @@ TOKEN_MAP = {
     "e": TokenType.T_E,
 }
 
+# Лексемы: числовой литерал целиком или одиночный символ
+_TOKENIZER = re.compile(r"([0-9][0-9.,]*)|(.)", re.DOTALL)
+
 # Обратный маппинг
 TOKEN_MAP_REV = {v: k for k, v in TOKEN_MAP.items()}
 
@@ -87,6 +128,64 @@ OPERATIONS = {
     TokenType.T_POW: operator.pow,
 }
 
+# Значения именованных констант
+CONSTANTS = {
+    TokenType.T_E: math.e,
+}
+
+# Построители замыканий листьев от x, y
+LEAF_CLOSURES = {
+    TokenType.T_NUM: lambda n: (lambda x, y, v=n._num: v),
+    TokenType.T_E: lambda n: (lambda x, y, v=n._num: v),
+    TokenType.T_VR1: lambda n: (lambda x, y: x),
+    TokenType.T_VR2: lambda n: (lambda x, y: y),
+}
+
+# Коды операций байткода вычислителя
+OP_NUM = 0
+OP_X = 1
+OP_Y = 2
+OP_ADD = 3
+OP_SUB = 4
+OP_MUL = 5
+OP_DIV = 6
+OP_POW = 7
+OP_NEG = 8
+
+# Маппинг типов нод на коды операций
+OPCODES = {
+    TokenType.T_NUM: OP_NUM,
+    TokenType.T_VR1: OP_X,
+    TokenType.T_VR2: OP_Y,
+    TokenType.T_ADD: OP_ADD,
+    TokenType.T_SUB: OP_SUB,
+    TokenType.T_MUL: OP_MUL,
+    TokenType.T_DIV: OP_DIV,
+    TokenType.T_POW: OP_POW,
+    TokenType.T_NEG: OP_NEG,
+}
+
+# Имена листьев в сгенерированном python-коде
+PY_NAMES = {
+    TokenType.T_VR1: "x",
+    TokenType.T_VR2: "y",
+    TokenType.T_E: "math.e",
+}
+
+# Операторы сгенерированного python-кода и их приоритеты
+PY_OPERATORS = {
+    TokenType.T_ADD: ("+", 1),
+    TokenType.T_SUB: ("-", 1),
+    TokenType.T_MUL: ("*", 2),
+    TokenType.T_DIV: ("/", 2),
+    TokenType.T_NEG: ("-", 3),
+    TokenType.T_POW: ("**", 4),
+}
+
+# Приоритеты унарного минуса и атомов (листьев) python-кода
+PY_UNARY = 3
+PY_ATOM = 5
+
 
 class LexerError(Exception):
     """Базовая ошибка лексера"""
@@ -132,128 +231,180 @@ class Node:
     """
     Класс ноды ast-дерева математического выражения
     """
+
+    __slots__ = (
+        "token_type",
+        "children",
+        "value",
+        "_num",
+        "_compiled",
+        "_const",
+        "_fast",
+        "_vec",
+        "_paths",
+        "__weakref__",
+    )
+
     def __init__(
-        self, token_type: TokenType, value: str = None, children: list[Self] = []
-    ) -> Self:
+        self, token_type: TokenType, value: str = None, children: list[Self] = None
+    ):
         self.token_type = token_type
-        self.children = list(children)
+        if children is None:
+            children = []
+        elif children is not _EMPTY:
+            children = list(children)
+        self.children = children
         self.value: str = value
-
-    def find(self, token_type: TokenType) -> bool:
-        """Рекурсивный поиск ноды среди детей"""
-        return (
-            any(c.find(token_type) for c in self.children)
-            or self.token_type == token_type
+        self._num: float = (
+            float(value) if token_type == TokenType.T_NUM else CONSTANTS.get(token_type)
         )
+        self._compiled: Callable[[float, float], float] = None
+        self._const: bool = None
+        self._fast: Callable[[float, float], float] = None
+        self._vec: Callable[[np.ndarray, np.ndarray], np.ndarray] = None
+        self._paths: dict[TokenType, tuple[int, ...]] = None
+
+    @classmethod
+    def leaf(cls, token_type: TokenType, value: str = None) -> Self:
+        """Лист дерева, без выделения списка детей"""
+        return cls(token_type, value, _EMPTY)
+
+    @classmethod
+    def make(
+        cls, token_type: TokenType, value: str = None, children: list[Self] = _EMPTY
+    ) -> Self:
+        """
+        Общая нода для одинаковых типа, значения и детей (по идентичности).
+
+        Ключом служат id детей: интернированная нода держит ссылки на своих
+        детей, поэтому, пока запись жива, их id не переиспользуются. Поддеревья
+        совпадают, только если дети сами получены через make; ноды парсера,
+        которые передаёт reverse, не интернированы. Изменять ноду нельзя.
+        """
+        key = (token_type, value, tuple(id(c) for c in children))
+        n = _INTERN.get(key)
+        if n is None:
+            n = cls(token_type, value, children if children else _EMPTY)
+            _INTERN[key] = n
+        return n
 
-    def path(self, token_type: TokenType) -> bool:
-        """Рекурсивный путь к ноде"""
-        if self.token_type == token_type:
-            return []
-        for i, c in enumerate(self.children):
-            p = c._path(token_type, i)
-            if p is not None:
-                return p
-        return None
-
-    def _path(self, token_type: TokenType, index: int) -> bool:
-        """Обработка поиска пути""""
-        if self.token_type == token_type:
-            return [index]
-        for i, c in enumerate(self.children):
-            p = c._path(token_type, i)
-            if p is not None:
-                return [index] + p
-        return None
-
-    def navigate(self, path: list[int]) -> Self:
+    def find(self, token_type: TokenType) -> bool:
+        """Поиск ноды в поддереве, по закэшированному пути к ней"""
+        return self._find_path(token_type) is not None
+
+    def path(self, token_type: TokenType) -> tuple[int, ...]:
+        """Путь к первой (в прямом порядке обхода) ноде, None если её нет"""
+        return self._find_path(token_type)
+
+    def _find_path(self, token_type: TokenType) -> tuple[int, ...]:
+        """
+        Путь к ноде обходом со стеком, результат кэшируется по типу ноды.
+        Дерево после разбора не изменяется, поэтому кэш не сбрасывается.
+        """
+        if self._paths is None:
+            self._paths = {}
+        elif token_type in self._paths:
+            return self._paths[token_type]
+
+        found = None
+        stack = [(self, ())]
+        while stack:
+            n, p = stack.pop()
+            if n.token_type == token_type:
+                found = p
+                break
+            for i in range(len(n.children) - 1, -1, -1):
+                stack.append((n.children[i], p + (i,)))
+        self._paths[token_type] = found
+        return found
+
+    def navigate(self, path: tuple[int, ...]) -> Self:
         """Прохождение по ast-дереву вглубь"""
-        if len(path) == 0:
-            return self
-        index = path.pop(0)
-        return self.children[index].navigate(path)
+        node = self
+        for index in path:
+            node = node.children[index]
+        return node
 
-    def reverse(self, path: list[int], second: Self) -> Self:
+    def reverse(self, path: tuple[int, ...], second: Self) -> Self:
         """Обработка решения дерева относительно указанной ноды"""
         item_prev = self
-        while len(path) > 0:
-            index = path.pop(0)
+        for index in path:
             item = item_prev.children[index]
 
             if item_prev.token_type == TokenType.T_NEG:
-                second = Node(TokenType.T_NEG, "-", [second])
+                second = Node.make(TokenType.T_NEG, "-", [second])
 
             elif item_prev.token_type == TokenType.T_SUB:
                 if index == 0:
-                    second = Node(
+                    second = Node.make(
                         TokenType.T_ADD,
                         "+",
                         [
-                            item_prev.children[not index],
+                            item_prev.children[1 - index],
                             second,
                         ],
                     )
                 else:
-                    second = Node(
+                    second = Node.make(
                         TokenType.T_SUB,
                         "-",
                         [
-                            item_prev.children[not index],
+                            item_prev.children[1 - index],
                             second,
                         ],
                     )
 
             elif item_prev.token_type == TokenType.T_ADD:
-                second = Node(
+                second = Node.make(
                     TokenType.T_SUB,
                     "-",
                     [
                         second,
-                        item_prev.children[not index],
+                        item_prev.children[1 - index],
                     ],
                 )
 
             elif item_prev.token_type == TokenType.T_MUL:
-                second = Node(
+                second = Node.make(
                     TokenType.T_DIV,
                     "/",
                     [
                         second,
-                        item_prev.children[not index],
+                        item_prev.children[1 - index],
                     ],
                 )
 
             elif item_prev.token_type == TokenType.T_DIV:
                 if index == 0:
-                    second = Node(
+                    second = Node.make(
                         TokenType.T_MUL,
                         "*",
                         [
-                            item_prev.children[not index],
+                            item_prev.children[1 - index],
                             second,
                         ],
                     )
                 else:
-                    second = Node(
+                    second = Node.make(
                         TokenType.T_DIV,
                         "/",
                         [
-                            item_prev.children[not index],
+                            item_prev.children[1 - index],
                             second,
                         ],
                     )
             elif item_prev.token_type == TokenType.T_POW:
-                second = Node(
+                second = Node.make(
                     TokenType.T_POW,
                     "^",
                     [
                         second,
-                        Node(
+                        Node.make(
                             TokenType.T_DIV,
                             "/",
                             [
-                                Node(TokenType.T_NUM, "1"),
-                                item_prev.children[not index],
+                                Node.make(TokenType.T_NUM, "1"),
+                                item_prev.children[1 - index],
                             ],
                         ),
                     ],
@@ -262,71 +413,337 @@ class Node:
             item_prev = item
         return second
 
-    def compute(self, x: float, y: float) -> float:
-        """Вычислить результат ОДУ"""
+    def is_const(self) -> bool:
+        """Проверка отсутствия переменных и производной в поддереве"""
+        if self._const is None:
+            self._const = self.token_type not in VARIABLES and all(
+                c.is_const() for c in self.children
+            )
+        return self._const
+
+    def simplify(self) -> Self:
+        """Свернуть константы и упростить тождества ast-дерева"""
+        if self.is_const() and self.token_type != TokenType.T_NUM:
+            try:
+                v = self.compute(0.0, 0.0)
+            except ArithmeticError:
+                v = None
+            if isinstance(v, float):
+                return Node.make(TokenType.T_NUM, repr(v))
+        if not self.children:
+            return Node.make(self.token_type, self.value)
+
+        n = Node.make(
+            self.token_type, self.value, [c.simplify() for c in self.children]
+        )
+        if n.token_type == TokenType.T_NEG:
+            c = n.children[0]
+            if c.token_type == TokenType.T_NEG:
+                return c.children[0]
+            return n
+        if len(n.children) != 2:
+            return n
+        l, r = n.children
+        if n.token_type == TokenType.T_MUL:
+            # Отброшенный множитель не должен скрывать inf, nan или ошибку деления
+            if (_is_num(l, 0.0) and _is_finite(r)) or (
+                _is_num(r, 0.0) and _is_finite(l)
+            ):
+                return Node.make(TokenType.T_NUM, "0")
+            if _is_num(l, 1.0):
+                return r
+            if _is_num(r, 1.0):
+                return l
+        elif n.token_type == TokenType.T_ADD:
+            if _is_num(l, 0.0):
+                return r
+            if _is_num(r, 0.0):
+                return l
+        elif n.token_type == TokenType.T_SUB:
+            if _is_num(r, 0.0):
+                return l
+            if _is_num(l, 0.0):
+                return Node.make(TokenType.T_NEG, "-", [r])
+        elif n.token_type == TokenType.T_DIV:
+            if _is_num(r, 1.0):
+                return l
+        elif n.token_type == TokenType.T_POW:
+            if _is_num(r, 0.0) and _is_finite(l):
+                return Node.make(TokenType.T_NUM, "1")
+            if _is_num(r, 1.0):
+                return l
+            # Составное основание вычислялось бы дважды
+            if _is_num(r, 2.0) and not l.children:
+                return Node.make(TokenType.T_MUL, "*", [l, l])
+        return n
+
+    def specialize_pow(self) -> Self:
+        """Раскрыть малые целые степени листа в цепочки умножений"""
+        if not self.children:
+            return self
+        children = [c.specialize_pow() for c in self.children]
+        if self.token_type == TokenType.T_POW:
+            base, exp = children
+            k = exp._num if exp.token_type == TokenType.T_NUM else None
+            if (
+                not base.children
+                and k is not None
+                and k.is_integer()
+                and 0 < abs(k) <= POW_UNROLL
+            ):
+                n = base
+                for _ in range(int(abs(k)) - 1):
+                    n = Node.make(TokenType.T_MUL, "*", [n, base])
+                if k < 0:
+                    n = Node.make(
+                        TokenType.T_DIV, "/", [Node.make(TokenType.T_NUM, "1"), n]
+                    )
+                return n
+        return Node.make(self.token_type, self.value, children)
+
+    def flatten(self) -> Self:
+        """
+        Свернуть левые цепочки сложений и умножений в n-арные ноды.
+
+        Правые поддеревья не сливаются: порядок округления остаётся исходным.
+        """
+        if not self.children:
+            return self
+        children = [c.flatten() for c in self.children]
+        if self.token_type in CHAINS and children[0].token_type == self.token_type:
+            children = list(children[0].children) + children[1:]
+        return Node.make(self.token_type, self.value, children)
+
+    def compile(self) -> list[tuple[int, float]]:
+        """Скомпилировать ast-дерево в постфиксный байткод"""
+        code: list[tuple[int, float]] = []
+        self._compile(code)
+        return code
+
+    def _compile(self, code: list[tuple[int, float]]):
+        """Обработка компиляции ноды"""
         if self.token_type == TokenType.T_DIF:
             print(self)
             raise EvaluateError(
                 "Произошла ошибка вычисления, значение дифференциала не вычисляется, проверьте дерево вывода."
             )
 
-        if self.token_type == TokenType.T_NUM:
-            return float(self.value)
-        elif self.token_type == TokenType.T_E:
-            return math.e
-        elif self.token_type == TokenType.T_VR1:
-            return x
-        elif self.token_type == TokenType.T_VR2:
-            return y
-        elif self.token_type in UNARY:
-            return OPERATIONS[self.token_type](self.children[0].compute(x, y)) # Убрать x, y
+        if self._num is not None:
+            code.append((OP_NUM, self._num))
+            return
+        op = (OPCODES[self.token_type], 0.0)
+        for i, c in enumerate(self.children):
+            c._compile(code)
+            # Операция применяется после каждого следующего операнда, слева направо
+            if i:
+                code.append(op)
+        if len(self.children) < 2:
+            code.append(op)
+
+    def closure(self) -> Callable[[float, float], float]:
+        """Скомпилировать ast-дерево в замыкание от x, y"""
+        if self._compiled is None:
+            self._compiled = self._closure()
+        return self._compiled
+
+    def _closure(self) -> Callable[[float, float], float]:
+        """Обработка компиляции ноды в замыкание"""
+        tt = self.token_type
+        if tt == TokenType.T_DIF:
+            print(self)
+            raise EvaluateError(
+                "Произошла ошибка вычисления, значение дифференциала не вычисляется, проверьте дерево вывода."
+            )
+
+        leaf = LEAF_CLOSURES.get(tt)
+        if leaf is not None:
+            return leaf(self)
+
+        op = OPERATIONS[tt]
+        if len(self.children) == 1:
+            c = self.children[0]._closure()
+            f = lambda x, y: op(c(x, y))
+        elif len(self.children) == 2:
+            l = self.children[0]._closure()
+            r = self.children[1]._closure()
+            f = lambda x, y: op(l(x, y), r(x, y))
         else:
-            left = self.children[0].compute(x, y)
-            right = self.children[1].compute(x, y)
-            return OPERATIONS[self.token_type](left, right)
+            first, *rest = [c._closure() for c in self.children]
+
+            def f(x: float, y: float) -> float:
+                v = first(x, y)
+                for c in rest:
+                    v = op(v, c(x, y))
+                return v
+
+        return f
+
+    def function(self) -> Callable[[float, float], float]:
+        """Функция f(x, y) ОДУ: сгенерированная при парсинге, иначе замыкание"""
+        return self._fast if self._fast is not None else self.closure()
+
+    def codegen(self) -> Callable[[float, float], float]:
+        """
+        Скомпилировать выражение to_py() в функцию от x, y.
+
+        Слишком глубокое для компилятора python выражение остаётся замыканием.
+        Поддеревья без y не кэшируются по x: в сгенерированном коде проверка
+        кэша стоит столько же, сколько вычисление обычного слагаемого от x.
+        """
+        # Код собирается только из операторов to_py, произвольные имена в него не попадают
+        try:
+            return eval(
+                compile("lambda x, y: " + self.to_py(), "<rhs>", "eval"),
+                {"__builtins__": {}, "math": math},
+            )
+        except (SyntaxError, RecursionError):
+            return self.closure()
+
+    def compute(self, x: float, y: float) -> float:
+        """Вычислить результат ОДУ"""
+        return self.function()(x, y)
+
+    def compute_vec(self, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+        """
+        Вычислить результат ОДУ сразу для массивов точек xs, ys.
+
+        Сгенерированная функция состоит только из арифметики, поэтому
+        вычисляется операциями numpy над массивами целиком.
+        """
+        if self._vec is None:
+            self._vec = self.codegen()
+        xs = np.asarray(xs, np.float64)
+        ys = np.asarray(ys, np.float64)
+        return np.broadcast_to(self._vec(xs, ys), np.broadcast(xs, ys).shape)
+
+    def to_py(self) -> str:
+        """Привести ast-дерево к выражению на python от x, y"""
+        return self._to_py()[0]
+
+    def _to_py(self) -> tuple[str, int]:
+        """
+        Выражение ноды на python и приоритет его внешней операции.
+
+        Скобки ставятся только вокруг операнда, связанного слабее операции.
+        Правый операнд того же приоритета тоже берётся в скобки, чтобы порядок
+        вычисления (и округления) остался как в дереве.
+        """
+        if self.token_type == TokenType.T_DIF:
+            raise EvaluateError(
+                "Value of differential is not computable, please check tree for reordering"
+            )
+        if self.token_type == TokenType.T_NUM:
+            v = self._num
+            if math.isnan(v):
+                return "math.nan", PY_ATOM
+            s = repr(v) if math.isfinite(v) else "math.inf"
+            if math.copysign(1.0, v) < 0:
+                return ("-" + s if math.isinf(v) else s), PY_UNARY
+            return s, PY_ATOM
+        if not self.children:
+            return PY_NAMES[self.token_type], PY_ATOM
+
+        op, p = PY_OPERATORS[self.token_type]
+        args = [c._to_py() for c in self.children]
+        if self.token_type == TokenType.T_NEG:
+            code, q = args[0]
+            return op + (code if q >= p else "(" + code + ")"), p
+        if self.token_type == TokenType.T_POW:
+            # Степень правоассоциативна, показатель может быть с унарным минусом
+            (base, qb), (exp, qe) = args
+            base = base if qb > p else "(" + base + ")"
+            exp = exp if qe >= PY_UNARY else "(" + exp + ")"
+            return base + op + exp, p
+        # n-арная цепочка вычисляется python слева направо, как исходная
+        first, q = args[0]
+        parts = [first if q >= p else "(" + first + ")"]
+        parts.extend(code if q > p else "(" + code + ")" for code, q in args[1:])
+        return op.join(parts), p
 
     def to_string(self, placeholders: bool = False):
         """Привести ast-дерево к строке"""
-        s: str = ""
+        buf: list[str] = []
+        self._to_string(buf, placeholders)
+        return "".join(buf)
+
+    def _to_string(self, buf: list[str], placeholders: bool):
+        """Запись строки ноды в буфер"""
         if self.token_type == TokenType.T_DIF:
             raise EvaluateError(
                 "Value of differential is not computable, please check tree for reordering"
             )
         if len(self.children) == 1:
-            s += "{}({})".format(self.value, self.children[0].to_string(placeholders))
-        elif len(self.children) == 2:
-            s += "({}){}({})".format(
-                self.children[0].to_string(placeholders),
-                self.value,
-                self.children[1].to_string(placeholders),
-            )
+            buf.append(self.value)
+            buf.append("(")
+            self.children[0]._to_string(buf, placeholders)
+            buf.append(")")
+        elif self.children:
+            for i, child in enumerate(self.children):
+                if i:
+                    buf.append(self.value)
+                buf.append("(")
+                child._to_string(buf, placeholders)
+                buf.append(")")
+        elif self.token_type == TokenType.T_NUM or not placeholders:
+            buf.append(self.value)
         else:
-            if self.token_type == TokenType.T_NUM:
-                s += self.value
-            else:
-                s += str("{" + self.value + "}") if placeholders else self.value
-        return s
+            buf.append("{" + self.value + "}")
 
     def __str__(self) -> str:
         """Строковое представление объекта"""
-        return "Node({}, {}{})".format(
-            self.token_type,
-            self.value,
-            ", [\n{}\n]".format(
-                "\n".join(
-                    [
-                        "    " + line
-                        for child in map(str, self.children)
-                        for line in child.split("\n")
-                    ]
-                )
-            )
-            if len(self.children)
-            else "",
-        )
+        buf: list[str] = []
+        self._str(buf, "")
+        return "".join(buf)
+
+    def _str(self, buf: list[str], indent: str):
+        """Запись представления ноды в буфер с отступом уровня"""
+        buf.append("{}Node({}, {}".format(indent, self.token_type, self.value))
+        if self.children:
+            buf.append(", [\n")
+            for i, child in enumerate(self.children):
+                if i:
+                    buf.append("\n")
+                child._str(buf, indent + "    ")
+            buf.append("\n{}]".format(indent))
+        buf.append(")")
+
+
+class TokenStream:
+    """Поток токенов с курсором на текущую позицию"""
+
+    __slots__ = ("ts", "i")
+
+    def __init__(self, ts: list[Node]):
+        self.ts = ts
+        self.i = 0
+
+    def peek(self) -> Node:
+        """Текущий токен"""
+        return self.ts[self.i]
+
+    def pop(self) -> Node:
+        """Извлечь текущий токен и сдвинуть курсор"""
+        n = self.ts[self.i]
+        self.i += 1
+        return n
+
+
+def _is_num(n: Node, v: float) -> bool:
+    """Проверка, что нода - число v"""
+    return n.token_type == TokenType.T_NUM and n._num == v
+
+
+def _is_finite(n: Node) -> bool:
+    """
+    Проверка, что значение ноды заведомо конечно и вычисляется без ошибок:
+    конечное число или переменная (решатели проверяют конечность x и y)
+    """
+    if n.token_type == TokenType.T_NUM:
+        return math.isfinite(n._num)
+    return n.token_type in (TokenType.T_VR1, TokenType.T_VR2)
 
 
-def ast_equ(ts: list[Node]) -> Node:
+def ast_equ(ts: TokenStream) -> Node:
     """Оператор равенства"""
     l_n = ast_sum(ts)
     while check(ts, TokenType.T_EQU):
@@ -337,7 +754,7 @@ def ast_equ(ts: list[Node]) -> Node:
     return l_n
 
 
-def ast_sum(ts: list[Node]) -> Node:
+def ast_sum(ts: TokenStream) -> Node:
     """Оператор суммы"""
     l_n = ast_mul(ts)
     while check(ts, [TokenType.T_ADD, TokenType.T_NEG]):
@@ -350,7 +767,7 @@ def ast_sum(ts: list[Node]) -> Node:
     return l_n
 
 
-def ast_mul(ts: list[Node]) -> Node:
+def ast_mul(ts: TokenStream) -> Node:
     """Оператор умножения"""
     l_n = ast_pow(ts)
     while check(ts, [TokenType.T_MUL, TokenType.T_DIV]):
@@ -361,7 +778,7 @@ def ast_mul(ts: list[Node]) -> Node:
     return l_n
 
 
-def ast_pow(ts: list[Node]) -> Node:
+def ast_pow(ts: TokenStream) -> Node:
     """Оператор степени"""
     l_n = ast_fun(ts)
     while check(ts, [TokenType.T_POW]):
@@ -372,15 +789,15 @@ def ast_pow(ts: list[Node]) -> Node:
     return l_n
 
 
-def ast_fun(ts: list[Node]) -> Node:
-    if ts[0].token_type == TokenType.T_NEG:
+def ast_fun(ts: TokenStream) -> Node:
+    if ts.peek().token_type == TokenType.T_NEG:
         n = consume(ts)
         n.children.append(ast_val(ts))
         return n
     return ast_val(ts)
 
 
-def ast_val(ts: list[Node]) -> Node:
+def ast_val(ts: TokenStream) -> Node:
     """Оператор производной"""
     if check(ts, TokenType.T_VR1):
         n = consume(ts)
@@ -390,12 +807,9 @@ def ast_val(ts: list[Node]) -> Node:
 
     elif check(ts, TokenType.T_NUM):
         n = consume(ts)
-        while check(ts, [TokenType.T_NUM, TokenType.T_PNT]):
-            r_n = consume(ts)
-            n.value += "." if r_n.token_type == TokenType.T_PNT else r_n.value
         if check(ts, TokenType.T_DIF):
             consume(ts)
-            n.value = "0"
+            n = Node.leaf(TokenType.T_NUM, "0")
         return n
 
     elif check(ts, TokenType.T_VR2):
@@ -420,71 +834,71 @@ def ast_val(ts: list[Node]) -> Node:
     return expression
 
 
-def match(ts: list[Node], exp: TokenType) -> Node:
+def match(ts: TokenStream, exp: TokenType) -> Node:
     """Нахождение совпадения"""
     if check(ts, exp):
         return consume(ts)
     else:
-        raise ParserError("Ошибка синтаксиса на операнде '{}'".format(ts[0]))
+        raise ParserError("Ошибка синтаксиса на операнде '{}'".format(ts.peek()))
 
 
-def consume(ts: list[Node]) -> Node:
-    """Удаление ноды из списка"""
-    return ts.pop(0)
+def consume(ts: TokenStream) -> Node:
+    """Извлечение ноды из потока"""
+    return ts.pop()
 
 
-def check(ts: list[Node], exp: TokenType | list[TokenType]):
+def check(ts: TokenStream, exp: TokenType | list[TokenType]):
     """Проверка соответствия ноды указанной/ым"""
     if isinstance(exp, list):
-        return ts[0].token_type in exp
-    return ts[0].token_type == exp
+        return ts.peek().token_type in exp
+    return ts.peek().token_type == exp
 
 
-def lex_analyse(s: str) -> list:
-    """Провести лексемный анализ выражения"""
-    s = s.lower()
+def lex_analyse(s: str) -> TokenStream:
+    """Провести лексемный анализ нормализованного выражения"""
     ts = []
 
-    if not TOKEN_MAP_REV[TokenType.T_EQU] in s:
+    if TOKEN_MAP_REV[TokenType.T_EQU] not in s:
         raise NoEquationError("Выражение должно содержать одно уравнение!")
 
-    if not TOKEN_MAP_REV[TokenType.T_VR1] in s:
+    if TOKEN_MAP_REV[TokenType.T_VR1] not in s:
         raise NoArgumentError("Уравнение должно содержать хотя бы один аргумент!")
 
-    if len(re.findall(TOKEN_MAP_REV[TokenType.T_VR2], s)) != 2:
+    if s.count(TOKEN_MAP_REV[TokenType.T_VR2]) != 2:
         raise NoODEError("Уравенение должно содержать функцию и её производную!")
-    if (
-        len(
-            re.findall(
-                TOKEN_MAP_REV[TokenType.T_VR2] + TOKEN_MAP_REV[TokenType.T_DIF], s
-            )
-        )
-        != 1
-    ):
+    if s.count(TOKEN_MAP_REV[TokenType.T_VR2] + TOKEN_MAP_REV[TokenType.T_DIF]) != 1:
         raise NoDifferentialError("Уравнение должно содержать одну производную!")
 
-    for i, c in enumerate(s):
-        if c in TOKEN_MAP:
-            tk = Node(TOKEN_MAP[c], value=c)
-        elif re.match(r"\d", c):
-            tk = Node(TokenType.T_NUM, value=c)
-        elif re.match(r"x", c) or re.match(r"y", c):
-            tk = Node(TokenType.T_VAR, value=c)
+    for m in _TOKENIZER.finditer(s):
+        if m.lastindex == 1:
+            try:
+                tk = Node.leaf(TokenType.T_NUM, m.group(1).replace(",", "."))
+            except ValueError:
+                raise UndefinedLexem(
+                    "Некорректное число: '{}' в строке, позиция {}".format(
+                        m.group(1), m.start()
+                    )
+                )
         else:
-            raise UndefinedLexem(
-                "Неизвестный символ: '{}' в строке, позиция {}".format(c, i)
-            )
+            c = m.group(2)
+            t = TOKEN_MAP.get(c)
+            if t is None:
+                raise UndefinedLexem(
+                    "Неизвестный символ: '{}' в строке, позиция {}".format(
+                        c, m.start()
+                    )
+                )
+            tk = Node(t, value=c) if t in BRANCHES else Node.leaf(t, c)
         ts.append(tk)
-    ts.append(Node(TokenType.T_END))
-    return ts
+    ts.append(Node.leaf(TokenType.T_END))
+    return TokenStream(ts)
 
 
 def reorder(tk: Node) -> Node:
     """Переобпределить выражения для решения ОДУ"""
     # Find in which half of equasion y' is located at
-    r: bool = tk.children[1].find(TokenType.T_DIF)
-    pr = tk.children[r]
-    s = tk.children[not r]
+    r = 1 if tk.children[1].find(TokenType.T_DIF) else 0
+    pr, s = tk.children[r], tk.children[1 - r]
 
     p = pr.path(TokenType.T_DIF)
     return pr.reverse(p, s)
@@ -492,8 +906,20 @@ def reorder(tk: Node) -> Node:
 
 def parse(s: str) -> Node:
     """Выполнить парсинг выражения"""
-    ts: list[Node] = lex_analyse("".join(s.split()))
+    # Регистр и пробелы нормализуются один раз, до лексера и ключа кэша
+    return _parse("".join(s.lower().split()))
+
+
+@functools.lru_cache(maxsize=256)
+def _parse(s: str) -> Node:
+    """Парсинг нормализованного выражения, результат кэшируется по строке"""
+    ts = lex_analyse(s)
     ast = ast_equ(ts)
     match(ts, TokenType.T_END)
     ast = reorder(ast)
+    ast = ast.simplify().specialize_pow().flatten()
+    if ast._fast is not None:
+        # Интернированное дерево уже разбиралось, функция собрана
+        return ast
+    ast._vec = ast._fast = ast.codegen()
     return ast
@@ -0,0 +1,120 @@
+"""
+Тесты численных методов решения ОДУ
+"""
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from differential import (
+    adams_ensemble,
+    get_rg_4,
+    hermite,
+    lmultistep,
+    solve_adams_batch,
+    solve_adaptive,
+)
+from parser import parse
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def test_adaptive_reaches_x_end():
+    """Адаптивный метод доходит ровно до конца отрезка"""
+    eq = parse("y' = x - y")
+    x0, h = 21.5083738008032, 0.8737803177413374
+    x_end = x0 + 3 * h
+    xs, ys, fs = solve_adaptive(eq, x0, 1.0, x_end, h)
+    assert xs[-1] == x_end
+
+    rnd = random.Random(0)
+    for _ in range(500):
+        x0 = rnd.uniform(-50, 50)
+        h = rnd.uniform(0.01, 1)
+        x_end = (x0 + h * np.arange(rnd.randint(1, 30) + 1))[-1]
+        xs, ys, fs = solve_adaptive(eq, x0, 1.0, x_end, h)
+        assert xs[-1] == x_end
+
+
+def test_adaptive_accuracy():
+    """Решение y' = x*y совпадает с exp(x^2 / 2)"""
+    eq = parse("y' = x*y")
+    xs, ys, fs = solve_adaptive(eq, 0.0, 1.0, 2.0, 0.1)
+    assert np.allclose(ys, np.exp(xs**2 / 2), rtol=1e-5)
+    assert np.allclose(fs, xs * ys)
+
+
+def test_hermite():
+    """Интерполяция Эрмита точна на кубическом многочлене"""
+    xs = np.array([0.0, 0.5, 2.0])
+    ys = xs**3
+    fs = 3 * xs**2
+    x = np.linspace(0, 2, 17)
+    assert np.allclose(hermite(xs, ys, fs, x), x**3)
+
+
+def test_hermite_single_node():
+    """Отрезок нулевой длины: одна точка решения"""
+    eq = parse("y' = x - y")
+    xs, ys, fs = solve_adaptive(eq, 1.0, 2.0, 1.0, 0.0)
+    assert len(xs) == 1
+    assert hermite(xs, ys, fs, np.full(4, 1.0)).tolist() == [2.0] * 4
+
+
+def _adams(eq, x0, y0, h, n):
+    """Метод Адамса на чистом python"""
+    xs = np.empty(max(n, 3) + 1)
+    ys = np.empty(max(n, 3) + 1)
+    get_rg_4(eq, x0, y0, h, xs, ys)
+    f = eq.function()
+    fs = [f(xs.item(k), ys.item(k)) for k in range(3)] + [0.0]
+    for i in range(4, n + 1):
+        lmultistep(f, xs, ys, fs, i, h)
+    return xs, ys
+
+
+def test_adams_batch():
+    """Векторный метод Адамса совпадает с поточечным"""
+    eq = parse("y' = x^2 - y/2")
+    y0 = np.array([0.0, 1.0, 2.5])
+    xs, ys = solve_adams_batch(eq, 0.0, y0, 0.1, 20)
+    for k, y in enumerate(y0):
+        xs1, ys1 = _adams(eq, 0.0, y, 0.1, 20)
+        assert np.allclose(xs, xs1)
+        assert np.allclose(ys[:, k], ys1)
+
+
+@pytest.mark.skipif(numba is None, reason="numba не установлена")
+def test_numba_kernels():
+    """Ядра numba совпадают с методами на чистом python"""
+    from _solver_numba import code_arrays, eval_code, solve_adams
+
+    eq = parse("2*y' + 3 = x*y - e")
+    ops, vals = code_arrays(eq.compile())
+    stack = np.empty(len(ops))
+    for x, y in [(0.5, 1.25), (-1.0, 2.0), (2.0, 0.0)]:
+        assert math.isclose(eval_code(ops, vals, x, y, stack), eq.compute(x, y))
+
+    xs = np.empty(21)
+    ys = np.empty(21)
+    solve_adams(ops, vals, 0.0, 1.0, 0.1, 20, xs, ys)
+    xs1, ys1 = _adams(eq, 0.0, 1.0, 0.1, 20)
+    assert np.allclose(xs, xs1)
+    assert np.allclose(ys, ys1)
+
+    y0 = np.array([1.0, 2.0])
+    xs, ys = adams_ensemble(eq, 0.0, y0, 0.1, 20)
+    assert np.allclose(ys[:, 0], ys1)
+
+
+def test_nonfinite_values_survive():
+    """inf и nan не теряются в скомпилированной функции уравнения"""
+    eq = parse("y' = y + x + " + "9" * 400 + " - " + "9" * 400)
+    assert math.isnan(eq.compute(1.0, 1.0))
+    with pytest.raises(ZeroDivisionError):
+        parse("y' = y/(x-x)").compute(1.0, 1.0)
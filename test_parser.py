@@ -0,0 +1,208 @@
+"""
+Тесты лексера, парсера и преобразований ast-дерева
+"""
+
+import math
+import random
+
+import pytest
+
+from parser import (
+    Node,
+    NoODEError,
+    TokenType,
+    UndefinedLexem,
+    lex_analyse,
+    parse,
+)
+
+
+def rhs(s: str) -> str:
+    """Правая часть разобранного уравнения строкой"""
+    return parse(s).to_string()
+
+
+def test_lexer_numbers():
+    """Числовой литерал - одна нода, запятая - десятичная точка"""
+    ts = lex_analyse("y'=12,5*x+y").ts
+    assert [(t.token_type, t.value) for t in ts] == [
+        (TokenType.T_VR2, "y"),
+        (TokenType.T_DIF, "'"),
+        (TokenType.T_EQU, "="),
+        (TokenType.T_NUM, "12.5"),
+        (TokenType.T_MUL, "*"),
+        (TokenType.T_VR1, "x"),
+        (TokenType.T_ADD, "+"),
+        (TokenType.T_VR2, "y"),
+        (TokenType.T_END, None),
+    ]
+
+
+def test_lexer_errors():
+    """Некорректные числа и неизвестные символы"""
+    with pytest.raises(UndefinedLexem):
+        parse("y' = 1.2.3*x + y")
+    with pytest.raises(UndefinedLexem):
+        parse("y' = x + y#")
+    with pytest.raises(NoODEError):
+        parse("y' = x")
+
+
+def test_parse_normalizes_input():
+    """Регистр и пробелы не влияют на результат разбора"""
+    assert parse("Y' = X + E*y") is parse("y'=x+e*y")
+
+
+@pytest.mark.parametrize(
+    "s, expected",
+    [
+        ("y' = x + 0 + y*1", "(x)+(y)"),
+        ("y' = x - 0 + y/1", "(x)+(y)"),
+        ("y' = 0 - x*y", "-((x)*(y))"),
+        ("y' = -(-(x+y))", "(x)+(y)"),
+        ("y' = x^1 + y^0 + x", "(x)+(1)+(x)"),
+        ("y' = y + x*0", "y"),
+        ("y' = 2*3 + x + y", "(6.0)+(x)+(y)"),
+        ("y' = x^2 + y", "((x)*(x))+(y)"),
+        # Составное основание не дублируется
+        ("y' = (x+1)^2 + y", "(((x)+(1))^(2))+(y)"),
+    ],
+)
+def test_simplify(s, expected):
+    """Свёртка констант и тождества"""
+    assert rhs(s) == expected
+
+
+def test_simplify_keeps_errors():
+    """Отброшенный множитель не скрывает деление на ноль"""
+    eq = parse("y' = y + x*(1/0)*0")
+    with pytest.raises(ZeroDivisionError):
+        eq.compute(1.0, 1.0)
+
+
+@pytest.mark.parametrize(
+    "s, expected",
+    [
+        ("y' = x + y + 1 + 2*x", "(x)+(y)+(1)+((2)*(x))"),
+        ("y' = x*y*x", "(x)*(y)*(x)"),
+        # Правые поддеревья не сливаются
+        ("y' = x + (y + 1)", "(x)+((y)+(1))"),
+    ],
+)
+def test_flatten(s, expected):
+    """Левые цепочки сумм и произведений - n-арные ноды"""
+    assert rhs(s) == expected
+
+
+@pytest.mark.parametrize(
+    "s, expected",
+    [
+        ("y' = x^5 + y", "((x)*(x)*(x)*(x)*(x))+(y)"),
+        ("y' = x^-3 + y", "((1)/((x)*(x)*(x)))+(y)"),
+        ("y' = (x+1)^3 + y", "(((x)+(1))^(3))+(y)"),
+        ("y' = x^9 + y", "((x)^(9))+(y)"),
+        ("y' = x^2.5 + y", "((x)^(2.5))+(y)"),
+    ],
+)
+def test_specialize_pow(s, expected):
+    """Малые целые степени листа раскрываются в умножения"""
+    assert rhs(s) == expected
+
+
+def test_specialize_pow_values():
+    """Раскрытая степень совпадает с pow"""
+    eq = parse("y' = x^7 - x^-2*y")
+    x, y = 1.3, 0.7
+    assert eq.compute(x, y) == pytest.approx(x**7 - x**-2 * y, rel=1e-14)
+
+
+def test_long_difference():
+    """Длинная разность не упирается в предел вложенности скобок"""
+    eq = parse("y' = y + x" + "-x" * 250)
+    assert eq.compute(1.0, 2.0) == -247.0
+
+
+@pytest.mark.parametrize(
+    "s, expected",
+    [
+        ("y' = -x^2 + (-2)^x - x^-x*y", "(-x)**2.0+(-2.0)**x-x**-x*y"),
+        ("y' = x + (y + 1)", "x+(y+1.0)"),
+        ("y' = x - (y - 1)", "x-(y-1.0)"),
+        ("y' = x / (y*x)", "x/(y*x)"),
+        ("y' = (x + y)*x", "(x+y)*x"),
+    ],
+)
+def test_to_py_precedence(s, expected):
+    """Скобки только там, где их требует приоритет операций"""
+    assert parse(s).to_py() == expected
+
+
+def _call(f, x, y):
+    """Значение функции или тип исключения"""
+    try:
+        return f(x, y)
+    except Exception as e:
+        return type(e)
+
+
+def _same(a, b) -> bool:
+    """Равенство значений, nan равен nan"""
+    return a == b or (a != a and b != b)
+
+
+POINTS = [(1.3, 0.7), (-0.6, 2.1), (2.0, -1.5)]
+
+
+@pytest.mark.parametrize(
+    "s",
+    [
+        "y' = x^2 - y/2",
+        "2*y' + 3 = x*y - e",
+        "y' = -x^2 + (-2)^x - x^-x*y",
+        "y' = x - (y - 1)*(x + 2)/(x - 3)",
+    ],
+)
+def test_to_py_round_trip(s):
+    """Исходный текст to_py вычисляет то же, что и compute"""
+    eq = parse(s)
+    f = eval("lambda x, y: " + eq.to_py(), {"math": math})
+    for x, y in POINTS:
+        assert _same(_call(f, x, y), _call(eq.compute, x, y))
+
+
+def _random_tree(rnd: random.Random, depth: int) -> Node:
+    """Случайное дерево, включая n-арные суммы и произведения"""
+    if depth == 0 or rnd.random() < 0.2:
+        k = rnd.random()
+        if k < 0.3:
+            return Node.leaf(TokenType.T_VR1, "x")
+        if k < 0.6:
+            return Node.leaf(TokenType.T_VR2, "y")
+        return Node.leaf(TokenType.T_NUM, repr(rnd.choice([2.0, -1.5, 0.5, -0.0, 3.0])))
+    t = rnd.choice(
+        [
+            TokenType.T_ADD,
+            TokenType.T_SUB,
+            TokenType.T_MUL,
+            TokenType.T_DIV,
+            TokenType.T_POW,
+            TokenType.T_NEG,
+            TokenType.T_ADD,
+            TokenType.T_MUL,
+        ]
+    )
+    if t == TokenType.T_NEG:
+        return Node(t, "-", [_random_tree(rnd, depth - 1)])
+    n = 3 if t in (TokenType.T_ADD, TokenType.T_MUL) and rnd.random() < 0.3 else 2
+    return Node(t, "?", [_random_tree(rnd, depth - 1) for _ in range(n)])
+
+
+def test_to_py_matches_closure():
+    """to_py и closure() вычисляют одно и то же на случайных деревьях"""
+    rnd = random.Random(3)
+    for _ in range(300):
+        t = _random_tree(rnd, 5)
+        f = eval("lambda x, y: " + t.to_py(), {"math": math})
+        g = t.closure()
+        for x, y in POINTS:
+            assert _same(_call(f, x, y), _call(g, x, y)), t.to_string()